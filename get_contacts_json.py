@@ -1,72 +1,160 @@
+import os
 import sys
 import json
 import time
+import logging
+import signal
 import objc
+from concurrent.futures import ThreadPoolExecutor
 from Contacts import (
-    CNContactStore, CNEntityType, CNContactFetchRequest,
-    CNEntityTypeContacts, CNContactSortOrderGivenName, CNContactGivenNameKey,
-    CNContactFamilyNameKey, CNContactMiddleNameKey, CNContactNamePrefixKey,
-    CNContactNameSuffixKey, CNContactNicknameKey, CNContactOrganizationNameKey,
+    CNContact, CNContactStore, CNEntityTypeContacts,
+    CNContactGivenNameKey, CNContactFamilyNameKey, CNContactOrganizationNameKey,
     CNContactPhoneNumbersKey, CNContactEmailAddressesKey, CNContactNoteKey,
-    CNContactIdentifierKey, CNContactTypeKey, CNContactStoreDidChangeNotification
+    CNContactIdentifierKey, CNContactStoreDidChangeNotification
 )
-from Foundation import (
-    NSAutoreleasePool, NSNotificationCenter, NSObject,
-    NSRunLoop, NSDefaultRunLoopMode, NSDate
+from CoreFoundation import CFRunLoopGetCurrent, CFRunLoopRun, CFRunLoopStop
+from Foundation import NSArray, NSNotificationCenter, NSNull, NSObject
+from libdispatch import (
+    dispatch_semaphore_create, dispatch_semaphore_wait, dispatch_semaphore_signal,
+    dispatch_time, DISPATCH_TIME_NOW, NSEC_PER_SEC
 )
-from libdispatch import dispatch_semaphore_create, dispatch_semaphore_wait, dispatch_semaphore_signal, DISPATCH_TIME_FOREVER
+from PyObjCTools import MachSignals
+
+try:
+    from Contacts import (
+        CNChangeHistoryFetchRequest, CNChangeHistoryAddContactEvent,
+        CNChangeHistoryUpdateContactEvent, CNChangeHistoryDeleteContactEvent,
+        CNChangeHistoryDropEverythingEvent
+    )
+except ImportError: # Change history requires macOS 10.15+
+    CNChangeHistoryFetchRequest = None
+
+try:
+    import orjson # Optional, much faster JSON encoder
+except ImportError:
+    orjson = None
+
+# Stdlib fallback encoder, built once; matches orjson's compact UTF-8 output
+JSON_ENCODER = json.JSONEncoder(ensure_ascii=False, separators=(",", ":"))
+# Escapes all non-ASCII text; used for lone UTF-16 surrogates, which NSString
+# allows but UTF-8 (and orjson) cannot encode
+ASCII_JSON_ENCODER = json.JSONEncoder(separators=(",", ":"))
+
+# Number of contacts encoded per stdout write when streaming a message
+EMIT_BATCH_SIZE = 1000
+
+# Log level name from the environment; unknown names fall back to INFO
+LOG_LEVEL = os.environ.get("CONTACTS_LOG_LEVEL", "INFO").upper()
+if not isinstance(logging.getLevelName(LOG_LEVEL), int):
+    LOG_LEVEL = "INFO"
+
+logging.basicConfig(
+    stream=sys.stderr,
+    level=LOG_LEVEL,
+    format="[%(asctime)s][Python] %(message)s",
+    datefmt="%H:%M:%S"
+)
+logger = logging.getLogger("get_contacts_json")
 
 # Global observer to prevent garbage collection
 observer = None
-last_sync_time = 0
-last_contact_ids = set()  # Track last known contact IDs
 
-def log_stderr(message):
-    """Prints a log message to stderr with a timestamp and script prefix."""
-    print(f"[{time.strftime('%H:%M:%S')}][Python] {message}", file=sys.stderr)
-    sys.stderr.flush()  # Ensure log is written immediately
+def log_stderr(message, level=logging.INFO):
+    """Logs a message to stderr with a timestamp and script prefix.
 
-def emit_json(data):
-    """Emits JSON data to stdout with a newline separator."""
-    print(json.dumps(data), flush=True)
-    print("", flush=True)  # Empty line as separator
+    The timestamp is only formatted for records at or above the configured
+    level (CONTACTS_LOG_LEVEL, default INFO), and the handler flushes each
+    record immediately. Errors should pass logging.ERROR so they are still
+    reported when the level is raised.
+    """
+    logger.log(level, message)
+
+def encode_json(data):
+    """Encodes data as compact UTF-8 JSON bytes, using orjson when installed.
+
+    Data containing lone surrogates is encoded with \\u escapes instead.
+    """
+    if orjson is not None:
+        try:
+            return orjson.dumps(data)
+        except orjson.JSONEncodeError:
+            pass  # Retried below, so malformed text is escaped, not fatal
+    try:
+        return JSON_ENCODER.encode(data).encode("utf-8")
+    except UnicodeEncodeError:
+        return ASCII_JSON_ENCODER.encode(data).encode("ascii")
 
-def get_required_keys():
-    """Returns a list of CNContact keys needed for the sync process.
+def emit_json(data):
+    """Emits JSON data to stdout with a newline separator.
 
-    Ensures essential keys like identifier, name components, organization,
-    phone, email, and note are included.
-    Removes duplicates while preserving order.
+    Writes the bytes directly to the stdout buffer, skipping the text layer.
+    A "contacts" array is streamed in batches of EMIT_BATCH_SIZE records, so
+    the full document is never built as a single string. If a record fails
+    to encode, the partial line is terminated before the error propagates.
 
-    Returns:
-        list: A list of CNContactKey constants.
+    Args:
+        data (dict): The message to emit.
     """
-    keys = [
-        CNContactGivenNameKey,
-        CNContactFamilyNameKey,
-        # CNContactMiddleNameKey, # Usually not needed for basic sync
-        # CNContactNamePrefixKey,
-        # CNContactNameSuffixKey,
-        # CNContactNicknameKey,
-        CNContactOrganizationNameKey,
-        CNContactPhoneNumbersKey,
-        CNContactEmailAddressesKey,
-        CNContactNoteKey,
-        CNContactIdentifierKey, # Essential for tracking
-        # CNContactTypeKey # Usually not needed for basic sync
-    ]
-    seen = set()
-    return [x for x in keys if not (x in seen or seen.add(x))]
-
-KEYS_TO_FETCH = get_required_keys()
+    write = sys.stdout.buffer.write
+    contacts = data.get("contacts")
+    if not contacts:
+        write(encode_json(data) + b"\n\n")  # Empty line as separator
+        sys.stdout.buffer.flush()
+        return
+
+    envelope = encode_json({key: value for key, value in data.items() if key != "contacts"})
+    write(envelope[:-1] + (b',"contacts":[' if len(envelope) > 2 else b'"contacts":['))
+    try:
+        for batch_start in range(0, len(contacts), EMIT_BATCH_SIZE):
+            if batch_start:
+                write(b",")
+            write(b",".join(map(encode_json, contacts[batch_start:batch_start + EMIT_BATCH_SIZE])))
+    except Exception:
+        # End the partial line so the reader drops it alone rather than
+        # gluing it onto the next message
+        write(b"\n\n")
+        sys.stdout.buffer.flush()
+        raise
+    write(b"]}\n\n")  # Empty line as separator
+    sys.stdout.buffer.flush()
+
+# CNContact keys needed for the sync process
+KEYS_TO_FETCH = (
+    CNContactGivenNameKey,
+    CNContactFamilyNameKey,
+    # CNContactMiddleNameKey, # Usually not needed for basic sync
+    # CNContactNamePrefixKey,
+    # CNContactNameSuffixKey,
+    # CNContactNicknameKey,
+    CNContactOrganizationNameKey,
+    CNContactPhoneNumbersKey,
+    CNContactEmailAddressesKey,
+    CNContactNoteKey,
+    CNContactIdentifierKey, # Essential for tracking
+    # CNContactTypeKey # Usually not needed for basic sync
+)
+# Bridged once so fetches don't convert the Python sequence on every call
+KEYS_TO_FETCH_NS = NSArray.arrayWithArray_(KEYS_TO_FETCH)
+
+# Seconds to wait for the user to answer the contact access prompt
+ACCESS_REQUEST_TIMEOUT_SECONDS = 30
+
+# Upper bound on threads used to fetch contact containers concurrently
+MAX_FETCH_WORKERS = 4
+
+# Seconds to wait for a burst of change notifications to settle before syncing
+CHANGE_DEBOUNCE_SECONDS = 0.5
+
+# Number of contacts formatted under a single autorelease pool
+AUTORELEASE_BATCH_SIZE = 1000
 
 def request_access(store):
     """Checks for and requests authorization to access macOS Contacts.
 
     Uses the Contacts framework to check the current status. If access is
     not determined, it requests access and waits synchronously for the user's
-    response. If access is denied or restricted, it logs an error and exits
-    the script.
+    response, for at most ACCESS_REQUEST_TIMEOUT_SECONDS. If access is denied,
+    restricted or the request times out, it logs an error and exits the script.
 
     Args:
         store (CNContactStore): An instance of the contact store.
@@ -81,7 +169,7 @@ def request_access(store):
     def completion_handler(success, error):
         granted[0] = success
         if error:
-            log_stderr(f"Error requesting access: {error}")
+            log_stderr(f"Error requesting access: {error}", logging.ERROR)
         dispatch_semaphore_signal(semaphore)
 
     # Get current authorization status
@@ -94,16 +182,20 @@ def request_access(store):
             CNEntityTypeContacts,
             completion_handler
         )
-        # Wait for the user's response
-        dispatch_semaphore_wait(semaphore, DISPATCH_TIME_FOREVER)
+        # Block until the user responds, but never hang forever if the prompt
+        # is dismissed abnormally; the completion handler is called on a
+        # background queue, so the main run loop does not need to run
+        timeout = dispatch_time(DISPATCH_TIME_NOW, ACCESS_REQUEST_TIMEOUT_SECONDS * NSEC_PER_SEC)
+        if dispatch_semaphore_wait(semaphore, timeout) != 0:
+            log_stderr("Timed out waiting for a response to the contact access request.", logging.WARNING)
     elif auth_status == 3: # Authorized
         granted[0] = True
     else: # Restricted or Denied
         granted[0] = False
 
     if not granted[0]:
-        log_stderr("Contact access denied or restricted.")
-        log_stderr("Please grant access in System Settings > Privacy & Security > Contacts.")
+        log_stderr("Contact access denied or restricted.", logging.ERROR)
+        log_stderr("Please grant access in System Settings > Privacy & Security > Contacts.", logging.ERROR)
         sys.exit(1) # Exit if access is not granted
 
     log_stderr("Contact access granted.")
@@ -116,176 +208,383 @@ def fetch_contacts(store, contact_ids=None):
         store: The CNContactStore instance
         contact_ids: Optional list of specific contact IDs to fetch. If None, fetches all contacts.
     """
-    pool = NSAutoreleasePool.alloc().init()
-    log_stderr("Fetching contacts...")
-    contacts_raw = []
-
-    try:
-        request = CNContactFetchRequest.alloc().initWithKeysToFetch_(KEYS_TO_FETCH)
-        request.setSortOrder_(CNContactSortOrderGivenName)
+    with objc.autorelease_pool():
+        log_stderr("Fetching contacts...")
+        contacts_raw = []
 
-        if contact_ids:
-            # Fetch specific contacts
-            for contact_id in contact_ids:
-                try:
-                    contact = store.unifiedContactWithIdentifier_keysToFetch_(
-                        contact_id,
-                        KEYS_TO_FETCH
-                    )
-                    if contact:
-                        contacts_raw.append(contact)
-                except Exception as e:
-                    log_stderr(f"Error fetching contact {contact_id}: {e}")
-        else:
-            # Fetch all contacts
-            success, error = store.enumerateContactsWithFetchRequest_error_usingBlock_(
-                request,
-                None,
-                lambda contact, stop: contacts_raw.append(contact)
-            )
-            if not success:
-                log_stderr(f"Error fetching contacts: {error}")
-                return None
-
-        log_stderr(f"Fetched {len(contacts_raw)} contacts successfully")
-        return contacts_raw
-    except Exception as e:
-        log_stderr(f"Exception while fetching contacts: {e}")
-        return None
-    finally:
-        del pool
+        try:
+            if contact_ids:
+                # Fetch specific contacts in a single identifier-predicate query
+                predicate = CNContact.predicateForContactsWithIdentifiers_(list(contact_ids))
+                contacts, error = store.unifiedContactsMatchingPredicate_keysToFetch_error_(
+                    predicate,
+                    KEYS_TO_FETCH_NS,
+                    None
+                )
+                if contacts is None:
+                    log_stderr(f"Error fetching contacts by identifier: {error}", logging.ERROR)
+                    return None
+                contacts_raw = list(contacts)
+            else:
+                # Fetch all contacts as one NSArray per container rather than
+                # calling back into Python once per contact
+                containers, error = store.containersMatchingPredicate_error_(None, None)
+                if containers is None:
+                    log_stderr(f"Error fetching containers: {error}", logging.ERROR)
+                    return None
+
+                def fetch_container(container):
+                    with objc.autorelease_pool():
+                        predicate = CNContact.predicateForContactsInContainerWithIdentifier_(
+                            container.identifier()
+                        )
+                        return store.unifiedContactsMatchingPredicate_keysToFetch_error_(
+                            predicate,
+                            KEYS_TO_FETCH_NS,
+                            None
+                        )
+
+                containers = list(containers)
+                if len(containers) > 1:
+                    # Containers are independent reads and pyobjc releases the
+                    # GIL inside each call, so fetch them concurrently
+                    with ThreadPoolExecutor(max_workers=min(len(containers), MAX_FETCH_WORKERS)) as executor:
+                        results = list(executor.map(fetch_container, containers))
+                else:
+                    results = [fetch_container(container) for container in containers]
+
+                seen_ids = set()
+                for contacts, error in results:
+                    if contacts is None:
+                        log_stderr(f"Error fetching contacts: {error}", logging.ERROR)
+                        return None
+
+                    if len(results) == 1:
+                        contacts_raw = list(contacts)
+                        break
+
+                    # Unified contacts can span containers; keep the first copy
+                    for contact in contacts:
+                        identifier = contact.identifier()
+                        if identifier not in seen_ids:
+                            seen_ids.add(identifier)
+                            contacts_raw.append(contact)
+
+            log_stderr(f"Fetched {len(contacts_raw)} contacts successfully")
+            return contacts_raw
+        except Exception as e:
+            log_stderr(f"Exception while fetching contacts: {e}", logging.ERROR)
+            return None
 
-def format_contacts_to_json(contacts_raw):
+def format_contacts_to_json(contacts_raw, failed_ids=None):
     """Formats a list of raw CNContact objects into a JSON serializable list.
 
     Iterates through the raw contacts, extracts the required fields
     (identifier, names, org, note, phones, emails), and structures them
     into dictionaries matching the format expected by the Node.js script.
-    Handles potential missing keys and formats labeled values (phone/email).
+    Key availability is checked once on the first contact, since all contacts
+    in a fetch share the same keys. Formats labeled values (phone/email).
+    Contacts with no names, organization, note, phones or emails are omitted.
 
     Args:
         contacts_raw (list): A list of CNContact objects from fetch_contacts.
+        failed_ids (set, optional): Receives the identifiers of contacts that
+            raised while being formatted, so callers can tell them apart from
+            empty contacts, which are omitted silently.
 
     Returns:
         list: A list of dictionaries, where each dictionary represents a contact
               in a JSON-friendly format.
     """
-    contacts_list = []
-    for contact in contacts_raw:
-        pool = NSAutoreleasePool.alloc().init() # Pool per contact iteration
-        try:
-            contact_dict = {
-                "identifier": contact.identifier(),
-                "givenName": contact.givenName() if contact.isKeyAvailable_(CNContactGivenNameKey) else None,
-                "familyName": contact.familyName() if contact.isKeyAvailable_(CNContactFamilyNameKey) else None,
-                "organizationName": contact.organizationName() if contact.isKeyAvailable_(CNContactOrganizationNameKey) else None,
-                "note": contact.note() if contact.isKeyAvailable_(CNContactNoteKey) else None,
-                "phoneNumbers": [],
-                "emailAddresses": []
-            }
-
-            # Process Phone Numbers
-            if contact.isKeyAvailable_(CNContactPhoneNumbersKey):
-                phones = contact.phoneNumbers()
-                if phones:
-                    for labeled_value in phones:
-                        phone_number = labeled_value.value().stringValue()
-                        label = labeled_value.label() # Can be None
-                        contact_dict["phoneNumbers"].append({"label": label, "value": phone_number})
-
-            # Process Email Addresses
-            if contact.isKeyAvailable_(CNContactEmailAddressesKey):
-                emails = contact.emailAddresses()
-                if emails:
-                    for labeled_value in emails:
-                        email_address = labeled_value.value()
-                        label = labeled_value.label() # Can be None
-                        contact_dict["emailAddresses"].append({"label": label, "value": email_address})
-
-            contacts_list.append(contact_dict)
-        except Exception as e:
-            identifier = "Unknown"
-            try:
-                 identifier = contact.identifier()
-            except: pass
-            log_stderr(f"Error processing contact {identifier}: {e}")
-        finally:
-            del pool # Release pool for this contact
-
+    if not contacts_raw:
+        return []
+
+    # Every contact in a fetch shares the same key set, so sample it once
+    first = contacts_raw[0]
+    has_given_name = first.isKeyAvailable_(CNContactGivenNameKey)
+    has_family_name = first.isKeyAvailable_(CNContactFamilyNameKey)
+    has_organization = first.isKeyAvailable_(CNContactOrganizationNameKey)
+    has_note = first.isKeyAvailable_(CNContactNoteKey)
+    has_phones = first.isKeyAvailable_(CNContactPhoneNumbersKey)
+    has_emails = first.isKeyAvailable_(CNContactEmailAddressesKey)
+
+    # Resolve the selectors once and call them unbound in the loop
+    get_identifier = CNContact.identifier
+    get_given_name = CNContact.givenName
+    get_family_name = CNContact.familyName
+    get_organization = CNContact.organizationName
+    get_note = CNContact.note
+    value_for_key_path = CNContact.valueForKeyPath_
+    null = NSNull.null()
+    # Labels are a handful of shared constants; keep one str per distinct label
+    label_cache = {}
+    shared_label = label_cache.setdefault
+
+    # Filled by index; entries stay None for empty or failed contacts
+    contact_count = len(contacts_raw)
+    contacts_list = [None] * contact_count
+    skipped = 0
+    for batch_start in range(0, contact_count, AUTORELEASE_BATCH_SIZE):
+        with objc.autorelease_pool(): # Pool per batch of contacts
+            for index in range(batch_start, min(batch_start + AUTORELEASE_BATCH_SIZE, contact_count)):
+                contact = contacts_raw[index]
+                try:
+                    # Process Phone Numbers; key paths on the contact read every
+                    # label/value in one call each (missing labels are NSNull)
+                    phone_numbers = [
+                        {"label": None if label is null else shared_label(label, label), "value": number}
+                        for label, number in zip(
+                            value_for_key_path(contact, "phoneNumbers.label"),
+                            value_for_key_path(contact, "phoneNumbers.value.stringValue")
+                        )
+                    ] if has_phones else []
+
+                    # Process Email Addresses
+                    email_addresses = [
+                        {"label": None if label is null else shared_label(label, label), "value": address}
+                        for label, address in zip(
+                            value_for_key_path(contact, "emailAddresses.label"),
+                            value_for_key_path(contact, "emailAddresses.value")
+                        )
+                    ] if has_emails else []
+
+                    given_name = get_given_name(contact) if has_given_name else None
+                    family_name = get_family_name(contact) if has_family_name else None
+                    organization = get_organization(contact) if has_organization else None
+                    note = get_note(contact) if has_note else None
+
+                    # Skip empty (e.g. suggested or mail-only) contacts entirely
+                    if not (given_name or family_name or organization or note
+                            or phone_numbers or email_addresses):
+                        skipped += 1
+                        continue
+
+                    contacts_list[index] = {
+                        "identifier": get_identifier(contact),
+                        "givenName": given_name,
+                        "familyName": family_name,
+                        "organizationName": organization,
+                        "note": note,
+                        "phoneNumbers": phone_numbers,
+                        "emailAddresses": email_addresses
+                    }
+                except Exception as e:
+                    skipped += 1
+                    identifier = "Unknown"
+                    try:
+                        identifier = get_identifier(contact)
+                        if failed_ids is not None:
+                            failed_ids.add(identifier)
+                    except Exception:
+                        pass
+                    log_stderr(f"Error processing contact {identifier}: {e}", logging.ERROR)
+
+    if skipped:
+        contacts_list = [contact_dict for contact_dict in contacts_list if contact_dict is not None]
     return contacts_list
 
+def contact_digest(contact_dict):
+    """Returns a hash of the synced fields of a formatted contact.
+
+    Args:
+        contact_dict (dict): A contact as produced by format_contacts_to_json.
+
+    Returns:
+        int: A hash that changes whenever any synced field changes.
+    """
+    return hash((
+        contact_dict["givenName"],
+        contact_dict["familyName"],
+        contact_dict["organizationName"],
+        contact_dict["note"],
+        tuple((phone["label"], phone["value"]) for phone in contact_dict["phoneNumbers"]),
+        tuple((email["label"], email["value"]) for email in contact_dict["emailAddresses"]),
+    ))
+
+def contact_digests(contacts_list):
+    """Maps each formatted contact's identifier to its contact_digest."""
+    return {
+        contact_dict["identifier"]: contact_digest(contact_dict)
+        for contact_dict in contacts_list
+    }
+
 class ContactStoreObserver(NSObject):
     def init(self):
         self = objc.super(ContactStoreObserver, self).init()
         if self is None:
             return None
         self.contact_store = CNContactStore.alloc().init()
-        self.last_contact_ids = set()
+        self.contact_hashes = {}  # identifier -> contact_digest of last sync
+        self.history_token = None  # Change history position, when supported
         return self
 
     def contactStoreDidChange_(self, notification):
-        try:
-            # Get current contact IDs
-            current_contact_ids = set()
-            contacts = fetch_contacts(self.contact_store)
-            if contacts:
-                for contact in contacts:
-                    current_contact_ids.add(contact.identifier())
-
-            # Find changed and deleted contacts
-            changed_contacts = []
-            deleted_contacts = list(self.last_contact_ids - current_contact_ids)
-
-            # Get full data for changed contacts
-            if current_contact_ids != self.last_contact_ids:
-                changed_contacts = fetch_contacts(self.contact_store, list(current_contact_ids - self.last_contact_ids))
-                if changed_contacts:
-                    for contact in changed_contacts:
-                        contact.change_type = 'added'
-                
-                # Get modified contacts
-                modified_contacts = fetch_contacts(self.contact_store, list(current_contact_ids & self.last_contact_ids))
-                if modified_contacts:
-                    for contact in modified_contacts:
-                        contact.change_type = 'modified'
-                    changed_contacts.extend(modified_contacts)
-
-            # Update last known IDs
-            self.last_contact_ids = current_contact_ids
-
-            # Send update message with only changed contacts
-            if changed_contacts or deleted_contacts:
-                print(json.dumps({
-                    "type": "update",
-                    "contacts": [format_contacts_to_json(c) for c in changed_contacts],
-                    "deleted_contacts": deleted_contacts
-                }))
-                print("", flush=True)  # Empty line as separator
+        # Notifications can arrive on any thread; the main run loop owns the timer
+        self.performSelectorOnMainThread_withObject_waitUntilDone_(
+            "scheduleFlush:", None, False
+        )
 
-        except Exception as e:
-            log_stderr(f"Unexpected error: {e}")
-            # On error, send full sync to ensure consistency
-            contacts = fetch_contacts(self.contact_store)
-            if contacts:
-                print(json.dumps({
-                    "type": "initial",
-                    "contacts": [format_contacts_to_json(c) for c in contacts]
-                }))
-                print("", flush=True)  # Empty line as separator
-
-def setup_observer(store):
-    """Sets up the contact change observer."""
-    global observer, last_contact_ids
+    def scheduleFlush_(self, _):
+        # Restart the coalescing timer so a burst of notifications syncs once
+        NSObject.cancelPreviousPerformRequestsWithTarget_selector_object_(
+            self, "flushChanges:", None
+        )
+        self.performSelector_withObject_afterDelay_(
+            "flushChanges:", None, CHANGE_DEBOUNCE_SECONDS
+        )
+
+    @objc.python_method
+    def sync_from_history(self):
+        """Emits the changes recorded in the store's history since the last sync.
+
+        Only contacts named by add/update events are fetched, so the work
+        is proportional to the change rather than to the address book.
+
+        Returns:
+            bool: True if the history was applied, False if a full diff is
+                needed (history unavailable or the framework asked for a
+                full resync).
+        """
+        request = CNChangeHistoryFetchRequest.alloc().init()
+        request.setStartingToken_(self.history_token)
+        request.setShouldUnifyResults_(True)
+        result, error = self.contact_store.enumeratorForChangeHistoryFetchRequest_error_(
+            request,
+            None
+        )
+        if result is None:
+            log_stderr(f"Error fetching change history: {error}", logging.WARNING)
+            return False
+
+        changed_ids = set()
+        deleted_ids = set()
+        drop_everything = False
+        for event in result.value():
+            if isinstance(event, (CNChangeHistoryAddContactEvent, CNChangeHistoryUpdateContactEvent)):
+                identifier = event.contact().identifier()
+                changed_ids.add(identifier)
+                deleted_ids.discard(identifier)
+            elif isinstance(event, CNChangeHistoryDeleteContactEvent):
+                identifier = event.contactIdentifier()
+                changed_ids.discard(identifier)
+                deleted_ids.add(identifier)
+            elif isinstance(event, CNChangeHistoryDropEverythingEvent):
+                drop_everything = True
+        # The token is only final once the events have been enumerated
+        self.history_token = result.currentHistoryToken()
+        if drop_everything:
+            return False
+
+        changed_contacts = []
+        if changed_ids:
+            contacts = fetch_contacts(self.contact_store, changed_ids)
+            if contacts is None:
+                return False
+            failed_ids = set()
+            for contact_dict in format_contacts_to_json(contacts, failed_ids):
+                identifier = contact_dict["identifier"]
+                changed_ids.discard(identifier)
+                digest = contact_digest(contact_dict)
+                if self.contact_hashes.get(identifier) != digest:
+                    self.contact_hashes[identifier] = digest
+                    changed_contacts.append(contact_dict)
+            # Contacts that failed to format keep their last synced state;
+            # the rest were removed again before the fetch or became empty
+            deleted_ids.update(changed_ids - failed_ids)
+
+        deleted_contacts = [
+            identifier for identifier in deleted_ids
+            if self.contact_hashes.pop(identifier, None) is not None
+        ]
+
+        if changed_contacts or deleted_contacts:
+            emit_json({
+                "type": "update",
+                "contacts": changed_contacts,
+                "deleted_contacts": deleted_contacts
+            })
+        return True
+
+    def flushChanges_(self, _):
+        # The run loop never drains the outer pool, so give each flush its own
+        with objc.autorelease_pool():
+            try:
+                if self.history_token is not None and self.sync_from_history():
+                    return
+
+                # Fall back to diffing the whole address book, taking the
+                # history position first so later flushes can use it
+                history_token = None
+                if CNChangeHistoryFetchRequest is not None and self.history_token is None:
+                    history_token = self.contact_store.currentHistoryToken()
+                contacts = fetch_contacts(self.contact_store)
+                if contacts is None:
+                    return
+
+                # Diff content hashes against the last sync in a single pass
+                current_hashes = {}
+                changed_contacts = []
+                failed_ids = set()
+                for contact_dict in format_contacts_to_json(contacts, failed_ids):
+                    identifier = contact_dict["identifier"]
+                    digest = contact_digest(contact_dict)
+                    current_hashes[identifier] = digest
+                    if self.contact_hashes.get(identifier) != digest:
+                        changed_contacts.append(contact_dict)
+                # A contact that failed to format is not a deletion; keep its
+                # last synced hash so it is retried on the next change
+                for identifier in failed_ids:
+                    if identifier in self.contact_hashes:
+                        current_hashes[identifier] = self.contact_hashes[identifier]
+                deleted_contacts = [
+                    identifier for identifier in self.contact_hashes
+                    if identifier not in current_hashes
+                ]
+
+                # Update last known state
+                self.contact_hashes = current_hashes
+                if history_token is not None:
+                    self.history_token = history_token
+
+                # Send update message with only changed contacts
+                if changed_contacts or deleted_contacts:
+                    emit_json({
+                        "type": "update",
+                        "contacts": changed_contacts,
+                        "deleted_contacts": deleted_contacts
+                    })
+
+            except Exception as e:
+                log_stderr(f"Unexpected error: {e}", logging.ERROR)
+                # On error, send full sync to ensure consistency
+                contacts = fetch_contacts(self.contact_store)
+                if contacts:
+                    formatted_contacts = format_contacts_to_json(contacts)
+                    emit_json({
+                        "type": "initial",
+                        "contacts": formatted_contacts
+                    })
+                    self.contact_hashes = contact_digests(formatted_contacts)
+
+def setup_observer(store, baseline_contacts=None, history_token=None):
+    """Sets up the contact change observer.
+
+    Args:
+        store: The CNContactStore instance
+        baseline_contacts: Optional formatted contacts from the initial sync,
+            used as the baseline for detecting changes.
+        history_token: Optional change history token read before the initial
+            fetch, so edits made while it was emitted are still reported.
+    """
+    global observer
     observer = ContactStoreObserver.alloc().init()
     if observer is None:
-        log_stderr("Failed to create observer")
+        log_stderr("Failed to create observer", logging.ERROR)
         return None
-    
-    # Get initial contact IDs
-    initial_contacts = fetch_contacts(store)
-    if initial_contacts is not None:
-        last_contact_ids = {contact.identifier() for contact in initial_contacts}
-        log_stderr(f"Initial contact count: {len(last_contact_ids)}")
+    if baseline_contacts:
+        observer.contact_hashes = contact_digests(baseline_contacts)
+        log_stderr(f"Initial contact count: {len(baseline_contacts)}")
+    observer.history_token = history_token
     
     # Register for notifications
     NSNotificationCenter.defaultCenter().addObserver_selector_name_object_(
@@ -300,49 +599,63 @@ def setup_observer(store):
 if __name__ == "__main__":
     """Main execution block."""
     store = CNContactStore.alloc().init()
-    pool = NSAutoreleasePool.alloc().init()
+    formatted_contacts = None
+    history_token = None
 
-    try:
-        if request_access(store):
-            # Initial fetch
-            raw_contacts = fetch_contacts(store)
-            if raw_contacts is not None:
-                formatted_contacts = format_contacts_to_json(raw_contacts)
-                current_time = time.time()
-                emit_json({
-                    "type": "initial",
-                    "timestamp": current_time,
-                    "contacts": formatted_contacts
-                })
-                last_sync_time = current_time
-                last_contact_ids = {contact.identifier() for contact in raw_contacts}
-                log_stderr(f"Initial fetch: {len(formatted_contacts)} contacts")
-
-            # Set up change observer
-            observer = setup_observer(store)
-            if observer is None:
-                log_stderr("Failed to set up observer")
-                sys.exit(1)
+    with objc.autorelease_pool():
+        try:
+            if request_access(store):
+                # Take the history position before fetching, so any edit made
+                # during the initial sync is replayed by the observer
+                if CNChangeHistoryFetchRequest is not None:
+                    history_token = store.currentHistoryToken()
+
+                # Initial fetch
+                raw_contacts = fetch_contacts(store)
+                if raw_contacts is not None:
+                    formatted_contacts = format_contacts_to_json(raw_contacts)
+                    current_time = time.time()
+                    emit_json({
+                        "type": "initial",
+                        "timestamp": current_time,
+                        "contacts": formatted_contacts
+                    })
+                    log_stderr(f"Initial fetch: {len(formatted_contacts)} contacts")
+
+                # Set up change observer; without an initial sync the first
+                # flush must full-diff, so the token is only kept alongside it
+                observer = setup_observer(
+                    store,
+                    formatted_contacts,
+                    history_token if formatted_contacts is not None else None
+                )
+                if observer is None:
+                    log_stderr("Failed to set up observer", logging.ERROR)
+                    sys.exit(1)
 
-            log_stderr("Contact change observer set up, waiting for changes...")
+                log_stderr("Contact change observer set up, waiting for changes...")
             
-            # Keep the process running
-            run_loop = NSRunLoop.currentRunLoop()
-            while True:
-                run_loop.runMode_beforeDate_(
-                    NSDefaultRunLoopMode,
-                    NSDate.dateWithTimeIntervalSinceNow_(1.0)
-                )
-        else:
-            log_stderr("Failed to get contact access")
+                # Keep the process running, blocked in the run loop until a
+                # shutdown signal stops it. MachSignals delivers the handler
+                # through a run-loop source, so it runs even while blocked.
+                main_run_loop = CFRunLoopGetCurrent()
+
+                def stop_run_loop(signum):
+                    log_stderr(f"Received signal {signum}, shutting down")
+                    CFRunLoopStop(main_run_loop)
+
+                for signum in (signal.SIGINT, signal.SIGTERM):
+                    MachSignals.signal(signum, stop_run_loop)
+                CFRunLoopRun()
+            else:
+                log_stderr("Failed to get contact access", logging.ERROR)
+                sys.exit(1)
+        except KeyboardInterrupt:
+            log_stderr("Received keyboard interrupt, shutting down")
+        except Exception as e:
+            log_stderr(f"Unexpected error: {e}", logging.ERROR)
             sys.exit(1)
-    except KeyboardInterrupt:
-        log_stderr("Received keyboard interrupt, shutting down")
-    except Exception as e:
-        log_stderr(f"Unexpected error: {e}")
-        sys.exit(1)
-    finally:
-        if observer:
-            NSNotificationCenter.defaultCenter().removeObserver_(observer)
-            log_stderr("Removed observer")
-        del pool 
\ No newline at end of file
+        finally:
+            if observer:
+                NSNotificationCenter.defaultCenter().removeObserver_(observer)
+                log_stderr("Removed observer")
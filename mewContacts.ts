@@ -902,6 +902,8 @@ export async function processContacts(
  */
 function startContactListener() {
     const pythonProcess = spawn("python3", ["get_contacts_json.py"]);
+    // Decode as a stream so multi-byte UTF-8 split across chunks stays intact
+    pythonProcess.stdout.setEncoding("utf8");
     let buffer = "";
 
     // Initialize API config once when listener starts